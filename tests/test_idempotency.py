@@ -1,5 +1,6 @@
 import ufl
 from tsfc import compile_form
+from tsfc import driver
 import pytest
 
 
@@ -58,19 +59,68 @@ def form(V, itype, request):
 
 
 def test_idempotency(form):
+    # Bypass the form cache, we want to compile twice.
+    driver._form_cache.clear()
     k1 = compile_form(form)[0]
+    driver._form_cache.clear()
     k2 = compile_form(form)[0]
 
     assert k1.ast.gencode() == k2.ast.gencode()
 
     # Test loopy backend
     import loopy
+    driver._form_cache.clear()
     k1 = compile_form(form, coffee=False)[0]
+    driver._form_cache.clear()
     k2 = compile_form(form, coffee=False)[0]
 
     assert loopy.generate_code_v2(k1.ast).device_code() == loopy.generate_code_v2(k2.ast).device_code()
 
 
+def test_form_cache(form):
+    driver._form_cache.clear()
+    k1, = compile_form(form)
+    k2, = compile_form(form)
+    assert k1 is k2
+
+    # Different options must not hit the cache
+    k3, = compile_form(form, coffee=False)
+    assert k3 is not k1
+
+
+def test_form_cache_eviction(monkeypatch):
+    driver._form_cache.clear()
+    monkeypatch.setattr(driver, "_form_cache_maxsize", 1)
+    mesh = ufl.Mesh(ufl.VectorElement("CG", ufl.triangle, 1))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("CG", ufl.triangle, 1))
+    u = ufl.TrialFunction(V)
+    v = ufl.TestFunction(V)
+    mass = ufl.inner(u, v)*ufl.dx
+    stiffness = ufl.inner(ufl.grad(u), ufl.grad(v))*ufl.dx
+
+    k1, = compile_form(mass)
+    compile_form(stiffness)
+    assert len(driver._form_cache) == 1
+    k2, = compile_form(mass)
+    assert k1 is not k2
+
+
+def test_form_cache_quadrature_rule_metadata():
+    from finat.quadrature import make_quadrature
+    from tsfc.finatinterface import as_fiat_cell
+
+    driver._form_cache.clear()
+    mesh = ufl.Mesh(ufl.VectorElement("CG", ufl.triangle, 1))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("CG", ufl.triangle, 1))
+    rule = make_quadrature(as_fiat_cell(ufl.triangle), 2)
+    form = ufl.TestFunction(V)*ufl.dx(metadata={"quadrature_rule": rule})
+
+    k1, = compile_form(form)
+    k2, = compile_form(form)
+    assert k1 is not k2
+    assert not driver._form_cache
+
+
 if __name__ == "__main__":
     import os
     import sys
@@ -0,0 +1,62 @@
+import pytest
+import ufl
+from tsfc import compile_form
+from tsfc import driver
+
+
+@pytest.fixture
+def form():
+    mesh = ufl.Mesh(ufl.VectorElement("CG", ufl.triangle, 1))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("CG", ufl.triangle, 2))
+    u = ufl.TrialFunction(V)
+    v = ufl.TestFunction(V)
+    return ufl.inner(ufl.grad(u), ufl.grad(v))*ufl.dx + ufl.inner(u, v)*ufl.ds
+
+
+@pytest.fixture
+def spy(monkeypatch):
+    results = []
+
+    def spy(*args):
+        result = _compile_integrals_parallel(*args)
+        results.append(result)
+        return result
+
+    _compile_integrals_parallel = driver._compile_integrals_parallel
+    monkeypatch.setattr(driver, "_compile_integrals_parallel", spy)
+    monkeypatch.setattr(driver, "PARALLEL_INTEGRALS", True)
+    return results
+
+
+def test_parallel_integrals(form, spy, monkeypatch):
+    import loopy
+    driver._form_cache.clear()
+    serial = compile_form(form, coffee=False)
+    assert len(serial) == 2
+    assert len(spy) == 1 and spy[0] is not None
+
+    spy.clear()
+    driver._form_cache.clear()
+    monkeypatch.setattr(driver, "PARALLEL_INTEGRALS", False)
+    expected = compile_form(form, coffee=False)
+    assert not spy
+
+    def gencode(kernel):
+        return loopy.generate_code_v2(kernel.ast).device_code()
+
+    assert [k.integral_type for k in serial] == [k.integral_type for k in expected]
+    assert [gencode(k) for k in serial] == [gencode(k) for k in expected]
+
+
+def test_parallel_integrals_coffee(form, spy):
+    # COFFEE kernels are not known to pickle, so are compiled serially
+    driver._form_cache.clear()
+    kernels = compile_form(form, coffee=True)
+    assert len(kernels) == 2
+    assert not spy
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    pytest.main(args=[os.path.abspath(__file__)] + sys.argv[1:])
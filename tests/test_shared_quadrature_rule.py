@@ -0,0 +1,74 @@
+import pytest
+import ufl
+from finat.quadrature import make_quadrature
+
+from tsfc import compile_form
+from tsfc import driver
+from tsfc.finatinterface import as_fiat_cell
+
+
+@pytest.fixture(params=["degree", "rule"])
+def metadata(request):
+    if request.param == "degree":
+        # Same degree: the cached default rule is shared
+        return {"quadrature_degree": 2}
+    else:
+        # Same user supplied rule object
+        return {"quadrature_rule": make_quadrature(as_fiat_cell(ufl.triangle), 2)}
+
+
+def mass_and_laplace(metadata0, metadata1):
+    mesh = ufl.Mesh(ufl.VectorElement("CG", ufl.triangle, 1))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("CG", ufl.triangle, 1))
+    u = ufl.TrialFunction(V)
+    v = ufl.TestFunction(V)
+    return (ufl.inner(u, v)*ufl.dx(metadata=dict(metadata0, mode="vanilla")) +
+            ufl.inner(ufl.grad(u), ufl.grad(v))*ufl.dx(metadata=dict(metadata1, mode="spectral")))
+
+
+def test_shared_quadrature_rule(metadata, monkeypatch):
+    form = mass_and_laplace(metadata, metadata)
+
+    orderings = []
+    compile_gem = driver.impero_utils.compile_gem
+
+    def spy(assignments, index_ordering, **kwargs):
+        orderings.append(index_ordering)
+        return compile_gem(assignments, index_ordering, **kwargs)
+
+    monkeypatch.setattr(driver.impero_utils, "compile_gem", spy)
+    driver._form_cache.clear()
+    kernel, = compile_form(form)
+
+    index_ordering, = orderings
+    assert len(index_ordering) == len(set(index_ordering))
+
+    # Compare against the same rule built separately for each integral
+    cell = as_fiat_cell(ufl.triangle)
+    rule0 = make_quadrature(cell, 2)
+    rule1 = make_quadrature(cell, 2)
+    assert rule0 is not rule1
+    expected, = compile_form(mass_and_laplace({"quadrature_rule": rule0},
+                                              {"quadrature_rule": rule1}))
+    assert len(orderings[1]) == len(index_ordering) + 1
+    assert kernel.flop_count == expected.flop_count
+
+
+def test_quadrature_degree_list():
+    cell = ufl.TensorProductCell(ufl.triangle, ufl.interval)
+    mesh = ufl.Mesh(ufl.VectorElement("P", cell, 1))
+    V = ufl.FunctionSpace(mesh, ufl.FiniteElement("P", cell, 1))
+    u = ufl.TrialFunction(V)
+    v = ufl.TestFunction(V)
+
+    driver._form_cache.clear()
+    kernel, = compile_form(ufl.inner(u, v)*ufl.dx(degree=[2, 1]))
+    driver._form_cache.clear()
+    expected, = compile_form(ufl.inner(u, v)*ufl.dx(degree=(2, 1)))
+    assert kernel.flop_count == expected.flop_count
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    pytest.main(args=[os.path.abspath(__file__)] + sys.argv[1:])
@@ -1,18 +1,24 @@
 import collections
+import collections.abc
 import operator
+import os
+import pickle
 import string
 import time
 import sys
-from functools import reduce
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, reduce
 from itertools import chain
 from finat.physically_mapped import DirectlyDefinedElement, PhysicallyMappedElement
 
-from numpy import asarray
+from numpy import broadcast_arrays, stack
 
 import ufl
 from ufl.algorithms import extract_arguments, extract_coefficients
 from ufl.algorithms.analysis import has_type
+from ufl.algorithms.replace import Replacer
 from ufl.classes import Form, GeometricQuantity
+from ufl.corealg.map_dag import map_expr_dag
 from ufl.log import GREEN
 from ufl.utils.sequences import max_degree
 
@@ -33,6 +39,16 @@ from tsfc.ufl_utils import apply_mapping
 # To handle big forms. The various transformations might need a deeper stack
 sys.setrecursionlimit(3000)
 
+# LRU cache of compiled kernels, keyed on the form signature and the
+# compilation options (see _form_cache_key).
+_form_cache = collections.OrderedDict()
+_form_cache_maxsize = 128
+
+# Compile the integrals of a form in separate processes.  Off by
+# default; set TSFC_PARALLEL_INTEGRALS=1 in the environment to enable.
+# Only applies to loopy kernels built by the default interface.
+PARALLEL_INTEGRALS = os.environ.get("TSFC_PARALLEL_INTEGRALS", "").strip().lower() in {"1", "true", "yes", "on"}
+
 
 def compile_form(form, prefix="form", parameters=None, interface=None, coffee=True, diagonal=False):
     """Compiles a UFL form into a set of assembly kernels.
@@ -43,28 +59,119 @@ def compile_form(form, prefix="form", parameters=None, interface=None, coffee=Tr
     :arg coffee: compile coffee kernel instead of loopy kernel
     :arg diagonal: Are we building a kernel for the diagonal of a rank-2 element tensor?
     :returns: list of kernels
+
+    Compiled kernels are cached: compiling a form with the same
+    signature and options again returns the same kernel objects,
+    which therefore must not be modified by the caller.
     """
     cpu_time = time.time()
 
     assert isinstance(form, Form)
 
+    key = _form_cache_key(form, prefix, parameters, interface, coffee, diagonal)
+    if key in _form_cache:
+        _form_cache.move_to_end(key)
+        logger.info(GREEN % "TSFC cache hit in %g seconds.", time.time() - cpu_time)
+        return list(_form_cache[key])
+
     # Determine whether in complex mode:
     complex_mode = parameters and is_complex(parameters.get("scalar_type"))
     fd = ufl_utils.compute_form_data(form, complex_mode=complex_mode)
     logger.info(GREEN % "compute_form_data finished in %g seconds.", time.time() - cpu_time)
 
-    kernels = []
-    for integral_data in fd.integral_data:
-        start = time.time()
-        kernel = compile_integral(integral_data, fd, prefix, parameters, interface=interface, coffee=coffee, diagonal=diagonal)
-        if kernel is not None:
-            kernels.append(kernel)
-        logger.info(GREEN % "compile_integral finished in %g seconds.", time.time() - start)
+    kernels = None
+    if PARALLEL_INTEGRALS and not coffee and interface is None and len(fd.integral_data) > 1:
+        kernels = _compile_integrals_parallel(fd, prefix, parameters, diagonal)
+    if kernels is None:
+        kernels = []
+        for integral_data in fd.integral_data:
+            start = time.time()
+            kernel = compile_integral(integral_data, fd, prefix, parameters, interface=interface, coffee=coffee, diagonal=diagonal)
+            if kernel is not None:
+                kernels.append(kernel)
+            logger.info(GREEN % "compile_integral finished in %g seconds.", time.time() - start)
+
+    if key is not None:
+        _form_cache[key] = tuple(kernels)
+        if len(_form_cache) > _form_cache_maxsize:
+            _form_cache.popitem(last=False)
 
     logger.info(GREEN % "TSFC finished in %g seconds.", time.time() - cpu_time)
     return kernels
 
 
+def _compile_integrals_parallel(form_data, prefix, parameters, diagonal):
+    """Compile all integrals of a form into loopy kernels in a process pool.
+
+    Only loopy kernels built by the default interface are known to be
+    picklable, so the caller must not use this for other backends.
+
+    :returns: list of kernels in integral data order, or None if the
+        form data could not be sent between processes (the caller
+        should then compile serially).
+    """
+    start = time.time()
+    # Pickle the form data once; each worker unpickles it on start-up.
+    try:
+        state = pickle.dumps((form_data, prefix, parameters, diagonal),
+                             protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        logger.info("Cannot pickle form data (%s), compiling serially.", e)
+        return None
+
+    max_workers = min(len(form_data.integral_data), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_parallel_worker,
+                             initargs=(state,)) as executor:
+        kernels = list(executor.map(_compile_integral_parallel,
+                                    range(len(form_data.integral_data))))
+    logger.info(GREEN % "compile_integral (parallel) finished in %g seconds.", time.time() - start)
+    return [kernel for kernel in kernels if kernel is not None]
+
+
+# Form data and options of the form being compiled by a worker process
+# (see _compile_integrals_parallel).
+_parallel_worker_state = None
+
+
+def _init_parallel_worker(state):
+    global _parallel_worker_state
+    _parallel_worker_state = pickle.loads(state)
+
+
+def _compile_integral_parallel(i):
+    """Compile the i-th integral of the form in a worker process."""
+    form_data, prefix, parameters, diagonal = _parallel_worker_state
+    return compile_integral(form_data.integral_data[i], form_data, prefix, parameters,
+                            interface=None, coffee=False, diagonal=diagonal)
+
+
+def _form_cache_key(form, prefix, parameters, interface, coffee, diagonal):
+    """Key identifying the output of :func:`compile_form`.
+
+    UFL caches the form signature on the form, so repeated lookups
+    for the same form object are cheap.
+
+    :returns: the key, or None if the form must not be cached.
+    """
+    # The form signature only records the str() of quadrature rule
+    # objects in integral metadata, which need not identify the rule.
+    for integral in form.integrals():
+        rule = integral.metadata().get("quadrature_rule")
+        if rule is not None and not isinstance(rule, str):
+            return None
+    if parameters is None:
+        parameters = {}
+    key = (form.signature(), prefix, tuple(sorted(parameters.items())),
+           interface, coffee, diagonal)
+    try:
+        hash(key)
+    except TypeError:
+        # Unhashable parameter values
+        return None
+    return key
+
+
 def compile_integral(integral_data, form_data, prefix, parameters, interface, coffee, *, diagonal=False):
     """Compiles a UFL integral into an assembly kernel.
 
@@ -112,6 +219,7 @@ def compile_integral(integral_data, form_data, prefix, parameters, interface, co
 
     fiat_cell = as_fiat_cell(cell)
     integration_dim, entity_ids = lower_integral_type(fiat_cell, integral_type)
+    integration_cell = fiat_cell.construct_subelement(integration_dim)
 
     quadrature_indices = []
 
@@ -156,7 +264,12 @@ def compile_integral(integral_data, form_data, prefix, parameters, interface, co
                       index_cache=index_cache,
                       scalar_type=parameters["scalar_type"])
 
-    mode_irs = collections.OrderedDict()
+    # Derivatives have been applied by compute_form_data, so we can
+    # skip the checks in ufl.replace and share one replacer between
+    # all integrals.
+    replacer = Replacer(form_data.function_replace_map)
+
+    mode_irs = {}
     for integral in integral_data.integrals:
         params = parameters.copy()
         params.update(integral.metadata())  # integral metadata overrides
@@ -164,9 +277,9 @@ def compile_integral(integral_data, form_data, prefix, parameters, interface, co
             del params["quadrature_rule"]
 
         mode = pick_mode(params["mode"])
-        mode_irs.setdefault(mode, collections.OrderedDict())
+        mode_irs.setdefault(mode, {})
 
-        integrand = ufl.replace(integral.integrand(), form_data.function_replace_map)
+        integrand = map_expr_dag(replacer, integral.integrand())
         integrand = ufl_utils.split_coefficients(integrand, builder.coefficient_split)
 
         # Check if the integral has a quad degree attached, otherwise use
@@ -179,8 +292,9 @@ def compile_integral(integral_data, form_data, prefix, parameters, interface, co
             quadrature_degree = params["estimated_polynomial_degree"]
             functions = list(arguments) + [builder.coordinate(mesh)] + list(integral_data.integral_coefficients)
             function_degrees = [f.ufl_function_space().ufl_element().degree() for f in functions]
-            if all((asarray(quadrature_degree) > 10 * asarray(degree)).all()
-                   for degree in function_degrees):
+            # Degrees may be tuples on tensor product cells
+            qd, *degrees = broadcast_arrays(quadrature_degree, *function_degrees)
+            if (qd > 10 * stack(degrees)).all():
                 logger.warning("Estimated quadrature degree %s more "
                                "than tenfold greater than any "
                                "argument/coefficient degree (max %s)",
@@ -189,15 +303,20 @@ def compile_integral(integral_data, form_data, prefix, parameters, interface, co
         try:
             quad_rule = params["quadrature_rule"]
         except KeyError:
-            integration_cell = fiat_cell.construct_subelement(integration_dim)
-            quad_rule = make_quadrature(integration_cell, quadrature_degree)
+            if isinstance(quadrature_degree, collections.abc.Iterable):
+                # Tensor product degrees may be given as lists, which
+                # are not hashable
+                quadrature_degree = tuple(quadrature_degree)
+            quad_rule = _make_quadrature(integration_cell, quadrature_degree)
 
         if not isinstance(quad_rule, AbstractQuadratureRule):
             raise ValueError("Expected to find a QuadratureRule object, not a %s" %
                              type(quad_rule))
 
         quadrature_multiindex = quad_rule.point_set.indices
-        quadrature_indices.extend(quadrature_multiindex)
+        # Integrals may share a (cached) quadrature rule
+        quadrature_indices.extend(i for i in quadrature_multiindex
+                                  if i not in quadrature_indices)
 
         config = kernel_cfg.copy()
         config.update(quadrature_rule=quad_rule)
@@ -266,6 +385,16 @@ def compile_integral(integral_data, form_data, prefix, parameters, interface, co
     return builder.construct_kernel(kernel_name, impero_c, index_names, quad_rule)
 
 
+@lru_cache(maxsize=256)
+def _make_quadrature(integration_cell, quadrature_degree):
+    """Cached :func:`finat.quadrature.make_quadrature`.
+
+    Quadrature rules are not modified after construction, so they
+    can be shared between integrals and kernels.
+    """
+    return make_quadrature(integration_cell, quadrature_degree)
+
+
 def compile_expression_dual_evaluation(expression, to_element, ufl_element, *,
                                        domain=None, interface=None,
                                        parameters=None):
@@ -431,9 +560,12 @@ class DualEvaluationCallable(object):
         return gem_expr
 
 
+@lru_cache(maxsize=None)
 def lower_integral_type(fiat_cell, integral_type):
     """Lower integral type into the dimension of the integration
-    subentity and a list of entity numbers for that dimension.
+    subentity and a tuple of entity numbers for that dimension.
+
+    Results are cached on (fiat_cell, integral_type).
 
     :arg fiat_cell: FIAT reference cell
     :arg integral_type: integral type (string)
@@ -465,11 +597,11 @@ def lower_integral_type(fiat_cell, integral_type):
         raise NotImplementedError("integral type %s not supported" % integral_type)
 
     if integral_type == 'exterior_facet_bottom':
-        entity_ids = [0]
+        entity_ids = (0,)
     elif integral_type == 'exterior_facet_top':
-        entity_ids = [1]
+        entity_ids = (1,)
     else:
-        entity_ids = list(range(len(fiat_cell.get_topology()[integration_dim])))
+        entity_ids = tuple(range(len(fiat_cell.get_topology()[integration_dim])))
 
     return integration_dim, entity_ids
 
@@ -21,7 +21,7 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with FFC. If not, see <http://www.gnu.org/licenses/>.
 
-from functools import singledispatch, partial
+from functools import lru_cache, singledispatch, partial
 import weakref
 
 import FIAT
@@ -83,9 +83,13 @@ element is supported, but must be handled specially because it doesn't
 have a direct FInAT equivalent."""
 
 
+@lru_cache(maxsize=None)
 def as_fiat_cell(cell):
     """Convert a ufl cell to a FIAT cell.
 
+    Results are cached, so the same FIAT cell is returned for equal
+    UFL cells.
+
     :arg cell: the :class:`ufl.Cell` to convert."""
     if not isinstance(cell, ufl.AbstractCell):
         raise ValueError("Expecting a UFL Cell")
@@ -1,17 +1,28 @@
 import numpy
 
-import coffee.base as coffee
-
 import gem
 
-from gem.utils import cached_property
+from gem.node import traversal
 
 from tsfc.kernel_interface import KernelInterface
 
 
+# Constant parts of the cell orientation expression
+_ORIENT_NEG1 = gem.Literal(-1)
+_ORIENT_POS1 = gem.Literal(1)
+_ORIENT_NAN = gem.Literal(numpy.nan)
+_ORIENT_ZERO = gem.Zero()
+
+
 class KernelBuilderBase(KernelInterface):
     """Helper class for building local assembly kernels."""
 
+    # Restriction to cell index in interior facet integrals
+    _RESTR = {'+': 0, '-': 1}
+    _RESTR_WITH_NONE = {None: 0, '+': 0, '-': 1}
+
+    unsummed_coefficient_indices = frozenset()
+
     def __init__(self, scalar_type, interior_facet=False):
         """Initialise a kernel builder.
 
@@ -27,12 +38,19 @@ class KernelBuilderBase(KernelInterface):
         # Coordinates
         self.domain_coordinate = {}
 
-        # Coefficients
+        # Coefficients.  Entries must not be changed once added, since
+        # coefficient() caches its results.
         self.coefficient_map = {}
+        self._coefficient_cache = {}
 
-    @cached_property
-    def unsummed_coefficient_indices(self):
-        return frozenset()
+        # Set up by subclasses
+        self._cell_sizes = None
+        self._cell_orientations = None
+        self._entity_number = None
+
+        # Cell orientation expressions, keyed on the cell orientation
+        # kernel argument
+        self._orient_cache = {}
 
     def coordinate(self, domain):
         return self.domain_coordinate[domain]
@@ -40,30 +58,41 @@ class KernelBuilderBase(KernelInterface):
     def coefficient(self, ufl_coefficient, restriction):
         """A function that maps :class:`ufl.Coefficient`s to GEM
         expressions."""
+        key = (ufl_coefficient, restriction)
+        try:
+            return self._coefficient_cache[key]
+        except KeyError:
+            pass
         kernel_arg = self.coefficient_map[ufl_coefficient]
-        if ufl_coefficient.ufl_element().family() == 'Real':
-            return kernel_arg
-        elif not self.interior_facet:
-            return kernel_arg
+        if not self.interior_facet:
+            result = kernel_arg
+        elif ufl_coefficient.ufl_element().family() == 'Real':
+            result = kernel_arg
         else:
-            return kernel_arg[{'+': 0, '-': 1}[restriction]]
+            result = kernel_arg[self._RESTR[restriction]]
+        self._coefficient_cache[key] = result
+        return result
 
     def cell_orientation(self, restriction):
         """Cell orientation as a GEM expression."""
-        f = {None: 0, '+': 0, '-': 1}[restriction]
+        f = self._RESTR_WITH_NONE[restriction]
         # Assume self._cell_orientations tuple is set up at this point.
         co_int = self._cell_orientations[f]
-        return gem.Conditional(gem.Comparison("==", co_int, gem.Literal(1)),
-                               gem.Literal(-1),
-                               gem.Conditional(gem.Comparison("==", co_int, gem.Zero()),
-                                               gem.Literal(1),
-                                               gem.Literal(numpy.nan)))
+        try:
+            return self._orient_cache[co_int]
+        except KeyError:
+            expr = gem.Conditional(gem.Comparison("==", co_int, _ORIENT_POS1),
+                                   _ORIENT_NEG1,
+                                   gem.Conditional(gem.Comparison("==", co_int, _ORIENT_ZERO),
+                                                   _ORIENT_POS1,
+                                                   _ORIENT_NAN))
+            return self._orient_cache.setdefault(co_int, expr)
 
     def cell_size(self, restriction):
-        if not hasattr(self, "_cell_sizes"):
+        if self._cell_sizes is None:
             raise RuntimeError("Haven't called set_cell_sizes")
         if self.interior_facet:
-            return self._cell_sizes[{'+': 0, '-': 1}[restriction]]
+            return self._cell_sizes[self._RESTR[restriction]]
         else:
             return self._cell_sizes
 
@@ -95,8 +124,11 @@ class KernelBuilderBase(KernelInterface):
         :arg body: function body (:class:`coffee.Block` node)
         :returns: :class:`coffee.FunDecl` object
         """
+        # Delayed import, loopy kernels do not need COFFEE
+        import coffee.base as coffee
+
         assert isinstance(body, coffee.Block)
-        body_ = coffee.Block(self.prepare + body.children + self.finalise)
+        body_ = coffee.Block([*self.prepare, *body.children, *self.finalise])
         return coffee.FunDecl("void", name, args, body_, pred=["static", "inline"])
 
     def register_requirements(self, ir):
@@ -107,3 +139,20 @@ class KernelBuilderBase(KernelInterface):
         """
         # Nothing is required by default
         pass
+
+
+def check_requirements(ir):
+    """Look for cell orientations, cell sizes, and collect tabulations
+    in one pass."""
+    cell_orientations = False
+    cell_sizes = False
+    rt_tabs = {}
+    for node in traversal(ir):
+        if isinstance(node, gem.Variable):
+            if node.name == "cell_orientations":
+                cell_orientations = True
+            elif node.name == "cell_sizes":
+                cell_sizes = True
+            elif node.name.startswith("rt_"):
+                rt_tabs[node.name] = node.shape
+    return cell_orientations, cell_sizes, tuple(sorted(rt_tabs.items()))
@@ -12,8 +12,7 @@ from gem.optimise import remove_componenttensors as prune
 import loopy as lp
 
 from tsfc.finatinterface import create_element
-from tsfc.kernel_interface.common import KernelBuilderBase as _KernelBuilderBase
-from tsfc.kernel_interface.firedrake import check_requirements
+from tsfc.kernel_interface.common import KernelBuilderBase as _KernelBuilderBase, check_requirements
 from tsfc.loopy import generate as generate_loopy
 
 